@@ -4,21 +4,17 @@
 # GitHub: github.com/richardloopez
 # Citation: If you use this code, please cite Lopez-Corbalan, R.
 
-import os
 import subprocess
-import tempfile
-import readline
 
 # Request the user for the necessary files and ranges
 parm_file = "system_hmass.prmtop"
 traj_file = "unified_traj.dcd"
 
-# Create a temporary file for cpptraj commands
-with tempfile.NamedTemporaryFile('w', delete=False) as tmpfile:
-    tmpfile_name = tmpfile.name
-    
-    # Write the cpptraj commands to the temporary file
-    tmpfile.write(f"""parm {parm_file}
+# cpptraj commands (piped to cpptraj's stdin, no temporary file needed)
+# All lie calculations share a single pass over the trajectory. Each pair keeps its own
+# .dat file: the file names carry the residue IDs and metal center that
+# prestep2 and the aggregation notebook (SEARCH_CONFIGS) filter on.
+cpptraj_commands = f"""parm {parm_file}
 trajin {traj_file}
 
 #M1
@@ -58,13 +54,10 @@ lie :1010 :1484 out _FE_lie_I_1010_O_1484_BP_HH.dat
 
 run
 quit
-""")
+"""
 
-# Execute cpptraj with the temporary command file
-subprocess.run(["cpptraj", "-i", tmpfile_name])
-
-# Remove the temporary file after execution
-os.remove(tmpfile_name)
+# Execute cpptraj reading the commands from stdin (check=True: stop if cpptraj fails)
+subprocess.run(["cpptraj"], input=cpptraj_commands, text=True, check=True)
 
 print(f"Lie analysis completed.dat'.")
 
@@ -5,16 +5,149 @@
 # Citation: If you use this code, please cite Lopez-Corbalan, R.
 
 import pandas as pd
-import glob
+import numpy as np
 import os
 import csv
-from statistics import mean, stdev
+
+# Define the list of variables (keywords) for similarity filtering:
+# statistics are inserted only in CSV files whose name contains ALL of them (case-insensitive)
+# MODIFY THIS LIST WITH YOUR REQUIRED KEYWORDS
+KEYWORDS_SIMILITUDE = ["DOCK","LIG"]
+
+# Columns for analysis (full Amber name -> short name used in the statistics header)
+COLS_ANALYSIS = {
+    'LIE_00001[EELEC]': '[EELEC]',
+    'LIE_00001[EVDW]': '[EVDW]',
+    '[ETOTAL]': '[ETOTAL]'
+}
+
+def to_float(value):
+    """
+    Converts a field to float, returning NaN if it is not numeric
+    (same as pd.to_numeric(..., errors='coerce')).
+    """
+    try:
+        return float(value)
+    except ValueError:
+        return float('nan')
+
+
+def format_float(value):
+    """
+    Formats a float for the CSV output, writing NaN as an empty field (as pandas does).
+    """
+    return '' if value != value else repr(value)
+
+
+def mean_std(values):
+    """
+    Calculates the mean and sample standard deviation (ddof=1) of an array,
+    ignoring NaN values (same results as pandas' Series.mean() and Series.std()).
+    """
+    values = values[~np.isnan(values)]
+    mean_val = values.mean() if values.size > 0 else np.nan
+    std_val = np.sqrt(np.square(values - mean_val).sum() / (values.size - 1)) if values.size > 1 else np.nan
+    return mean_val, std_val
+
+
+def energy_stats(eelec, evdw, etotal):
+    """
+    Calculates the statistics of the three energy columns while the data is already in memory.
+
+    Returns:
+        A dictionary mapping each column name to a (mean, std) tuple.
+    """
+    return {
+        'LIE_00001[EELEC]': mean_std(eelec),
+        'LIE_00001[EVDW]': mean_std(evdw),
+        '[ETOTAL]': mean_std(etotal),
+    }
+
+
+def scan_folder(folder_path="."):
+    """
+    Lists the .dat and .csv files of a folder in a single directory pass.
+
+    Hidden files are skipped, as glob would do. Only the entry names are
+    checked, so no stat call is made per file.
+
+    Returns:
+        A tuple (dat_files, csv_files) with the paths of the files found
+        (both empty if the folder does not exist, as with glob).
+    """
+    try:
+        with os.scandir(folder_path) as it:
+            entries = [e for e in it if not e.name.startswith('.')]
+    except FileNotFoundError:
+        return [], []
+    dat_files = [e.path for e in entries if e.name.endswith('.dat')]
+    csv_files = [e.path for e in entries if e.name.endswith('.csv')]
+    return dat_files, csv_files
+
+
+def matches_keywords(file_name, lowered_keywords):
+    """
+    Checks if ALL keywords are present in the filename (case-insensitive).
+    The keywords must already be lowercased, so this is done once per list and not per file.
+    """
+    file_name_lower = file_name.lower()
+    return all(keyword in file_name_lower for keyword in lowered_keywords)
+
+
+def build_stats_header(file_name, stats):
+    """
+    Builds the statistics header inserted at the very top of a CSV file.
+
+    Args:
+        file_name (str): The name of the CSV file.
+        stats (dict): Maps column names to (mean, std) tuples.
+
+    Returns:
+        The header rows (lists for csv.writer), or an empty list if no statistics are available.
+    """
+    # List to store results for insertion
+    results = []
+    
+    for df_col, short_name in COLS_ANALYSIS.items():
+        if df_col in stats:
+            # Mean and standard deviation
+            mean_val, std_val = stats[df_col]
+            
+            # Store results in a simplified list format
+            results.append([
+                f"{short_name} Mean", f"{mean_val:.4f}"
+            ])
+            results.append([
+                f"{short_name} Std", f"{std_val:.4f}"
+            ])
+        else:
+            print(f"   Warning: Column '{df_col}' not found in the file. Skipping stats for it.")
+
+    if not results:
+        return []
+
+    # Create the new header structure
+    header_lines = [
+        ["# LIE STATISTICS - " + file_name],
+        ["#--------------------------------------"],
+    ]
+    
+    # Consolidate all statistics into a single metadata line
+    metadata_line = ["# METADATA:"]
+    for label, value in results:
+        metadata_line.append(f"{label.replace(':', '')} = {value}")
+    
+    header_lines.append(metadata_line)
+    header_lines.append(["#--------------------------------------"])
+    return header_lines
+
 
 def process_lie_files(folder_path="."):
     """
     1. Finds LIE files (.dat), calculates the total energy (EELEC + EVDW),
-       and saves the result to a new CSV file.
-    2. Calls the function to filter and analyze the newly created CSVs.
+       and saves the result to a new CSV file. If the file name contains all
+       the KEYWORDS_SIMILITUDE, the statistics header is written in the same pass.
+    2. Calls the function to filter and analyze the remaining CSVs.
 
     Args:
         folder_path (str): The path to the folder containing the files.
@@ -23,11 +156,16 @@ def process_lie_files(folder_path="."):
 
     # --- PART 1: DAT to CSV Conversion and ETOTAL Calculation ---
 
+    # Lowercased keywords, computed once for all the files
+    lowered_keywords = [keyword.lower() for keyword in KEYWORDS_SIMILITUDE]
+
+    # CSV files generated (with their statistics, if they matched the keywords) in Part 1
+    processed_files = set()
+
     print("--- Part 1: Converting .dat to .csv and calculating [ETOTAL] ---")
 
-    # Find all files ending in .dat in the folder
-    search_pattern_dat = os.path.join(folder_path, "*.dat")
-    lie_files = glob.glob(search_pattern_dat)
+    # Find all files ending in .dat (and the existing .csv, for Part 2) in the folder
+    lie_files, csv_files = scan_folder(folder_path)
 
     if not lie_files:
         print(f"?? No LIE files (.dat) found in the folder: {folder_path}")
@@ -39,37 +177,52 @@ def process_lie_files(folder_path="."):
             print(f"\nProcessing file: {os.path.basename(lie_file)}...")
 
             try:
-                # Define column names based on the file format
-                lie_columns = ['Frame', 'EELEC_val', 'EVDW_val']
-
-                # Read the file, skipping the header line (#Frame...)
-                # 'sep=r"\s+"' handles multiple spaces as separator.
-                df = pd.read_csv(
-                    lie_file,
-                    sep=r"\s+",
-                    skiprows=1,
-                    names=lie_columns,
-                    index_col=False,
-                    engine='python'
-                )
-
-                # Rename columns to their full Amber names for clarity (assuming they are columns 2 and 3)
-                df.rename(columns={'EELEC_val': 'LIE_00001[EELEC]', 'EVDW_val': 'LIE_00001[EVDW]'}, inplace=True)
-
-                # Convert columns to numeric (coercing errors) and calculate Total Energy
-                df['LIE_00001[EELEC]'] = pd.to_numeric(df['LIE_00001[EELEC]'], errors='coerce')
-                df['LIE_00001[EVDW]'] = pd.to_numeric(df['LIE_00001[EVDW]'], errors='coerce')
-
-                # Add the [ETOTAL] column
-                df['[ETOTAL]'] = df['LIE_00001[EELEC]'] + df['LIE_00001[EVDW]']
-
                 # Generate the new CSV file name
                 base_name = os.path.splitext(lie_file)[0]  # Removes original extension
                 csv_file = base_name + ".csv"
 
-                # Save the DataFrame to a CSV file
-                df.to_csv(csv_file, index=False)
-                print(f"File successfully saved as: {os.path.basename(csv_file)}")
+                # Read the file line by line: skip the header line (#Frame...) and split on
+                # whitespace (handles multiple spaces as separator)
+                frames, eelec_values, evdw_values = [], [], []
+                with open(lie_file, 'r') as fin:
+                    next(fin, None)
+                    for line in fin:
+                        fields = line.split()
+                        if not fields:
+                            continue
+                        fields += [''] * (3 - len(fields))
+
+                        # Convert to numeric (coercing errors to NaN)
+                        frames.append(fields[0])
+                        eelec_values.append(to_float(fields[1]))
+                        evdw_values.append(to_float(fields[2]))
+
+                # Calculate the Total Energy (EELEC + EVDW)
+                eelec = np.array(eelec_values, dtype=np.float64)
+                evdw = np.array(evdw_values, dtype=np.float64)
+                etotal = np.add(eelec, evdw)
+
+                # Statistics header, only calculated for files that meet the similarity condition
+                file_name = os.path.basename(csv_file)
+                header_lines = []
+                if matches_keywords(file_name, lowered_keywords):
+                    header_lines = build_stats_header(file_name, energy_stats(eelec, evdw, etotal))
+
+                # Save the statistics header and the rows to a CSV file in a single pass,
+                # using the full Amber column names
+                with open(csv_file, 'w', newline='') as fout:
+                    writer = csv.writer(fout, lineterminator='\n')
+                    writer.writerows(header_lines)
+                    writer.writerow(['Frame', 'LIE_00001[EELEC]', 'LIE_00001[EVDW]', '[ETOTAL]'])
+                    writer.writerows(
+                        (frame, format_float(e), format_float(v), format_float(t))
+                        for frame, e, v, t in zip(frames, eelec_values, evdw_values, etotal.tolist())
+                    )
+
+                processed_files.add(csv_file)
+                print(f"File successfully saved as: {file_name}")
+                if header_lines:
+                    print(f"   ? Statistics inserted at the beginning of: {file_name}")
 
             except Exception as e:
                 print(f"? An error occurred while processing {os.path.basename(lie_file)}: {e}")
@@ -78,32 +231,40 @@ def process_lie_files(folder_path="."):
     # --- PART 2: Filtering, Analysis, and Header Insertion ---
 
     print("\n--- Part 2: Filtering, Analyzing, and Inserting Statistics ---")
-    analyze_filtered_csvs(folder_path)
+    analyze_filtered_csvs(folder_path, csv_files=csv_files, skip_files=processed_files)
     
     print("\n? Process completed.")
 
 
-def analyze_filtered_csvs(folder_path="."):
+def analyze_filtered_csvs(folder_path=".", csv_files=None, skip_files=()):
     """
     Filters CSV files by keywords in the name, calculates mean/std for energy
     columns, and inserts these results at the top of the CSV file.
 
     Args:
         folder_path (str): The path to the folder containing the files.
+        csv_files (list): Optional CSV files already listed from the folder.
+                          If not given, the folder is scanned.
+        skip_files (set): CSV files already written with their statistics (Part 1).
     """
     
-    # 1. Define the list of variables (keywords) for similarity filtering
-    # MODIFY THIS LIST WITH YOUR REQUIRED KEYWORDS
-    keywords_similitude = ["DOCK","LIG"]
+    # 1. Keywords for similarity filtering (see KEYWORDS_SIMILITUDE)
+    keywords_similitude = KEYWORDS_SIMILITUDE
     print(f"Searching for CSV files containing ALL these keywords: {keywords_similitude}")
     print("-" * 50)
+    lowered_keywords = [keyword.lower() for keyword in keywords_similitude]
 
     # Find all files ending in .csv in the folder
-    search_pattern_csv = os.path.join(folder_path, "*.csv")
-    csv_files = glob.glob(search_pattern_csv)
+    if csv_files is None:
+        _, csv_files = scan_folder(folder_path)
+    csv_files = [f for f in csv_files if f not in skip_files]
 
     if not csv_files:
-        print(f"?? No CSV files found in the folder: {folder_path}")
+        if skip_files:
+            # Every CSV in the folder was generated in Part 1, with its statistics already written
+            print("? No other CSV files to analyze.")
+        else:
+            print(f"?? No CSV files found in the folder: {folder_path}")
         return
 
     filtered_files = []
@@ -113,7 +274,7 @@ def analyze_filtered_csvs(folder_path="."):
         file_name = os.path.basename(csv_file)
         
         # Check if ALL keywords are present in the filename (case-insensitive)
-        if all(keyword.lower() in file_name.lower() for keyword in keywords_similitude):
+        if matches_keywords(file_name, lowered_keywords):
             filtered_files.append(csv_file)
             print(f"? Found and marked: {file_name}")
     
@@ -131,62 +292,25 @@ def analyze_filtered_csvs(folder_path="."):
         print(f"Calculating statistics for: {file_name}")
 
         try:
-            # Load the DataFrame
+            # Load the DataFrame and calculate mean and standard deviation
             df = pd.read_csv(csv_file)
-
-            # Columns for analysis
-            cols_analysis = {
-                'LIE_00001[EELEC]': '[EELEC]',
-                'LIE_00001[EVDW]': '[EVDW]',
-                '[ETOTAL]': '[ETOTAL]'
+            stats = {
+                df_col: mean_std(df[df_col].to_numpy(dtype=np.float64))
+                for df_col in COLS_ANALYSIS if df_col in df.columns
             }
             
-            # List to store results for insertion
-            results = []
-            
-            for df_col, short_name in cols_analysis.items():
-                if df_col in df.columns:
-                    # Calculate mean and standard deviation
-                    mean_val = df[df_col].mean()
-                    std_val = df[df_col].std()
-                    
-                    # Store results in a simplified list format
-                    results.append([
-                        f"{short_name} Mean", f"{mean_val:.4f}"
-                    ])
-                    results.append([
-                        f"{short_name} Std", f"{std_val:.4f}"
-                    ])
-                else:
-                    print(f"   Warning: Column '{df_col}' not found in the file. Skipping stats for it.")
-
-            
             # 7. Insert results at the very top of the document
-            if results:
+            header_lines = build_stats_header(file_name, stats)
+            if header_lines:
                 temp_file = csv_file + ".tmp"
                 
-                # Create the new header structure
-                header_lines = [
-                    ["# LIE STATISTICS - " + file_name],
-                    ["#--------------------------------------"],
-                ]
-                
-                # Consolidate all statistics into a single metadata line
-                metadata_line = ["# METADATA:"]
-                for label, value in results:
-                    metadata_line.append(f"{label.replace(':', '')} = {value}")
-                
-                header_lines.append(metadata_line)
-                header_lines.append(["#--------------------------------------"])
-                
-                
                 # Open the temp file for writing and the original for reading
                 with open(csv_file, 'r', newline='') as infile, \
                      open(temp_file, 'w', newline='') as outfile:
                     
                     # Use the csv module for safe reading/writing
                     reader = csv.reader(infile)
-                    writer = csv.writer(outfile)
+                    writer = csv.writer(outfile, lineterminator='\n') # Same line endings as Part 1
                     
                     # Write the new statistics header
                     for row in header_lines:
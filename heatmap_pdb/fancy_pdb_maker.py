@@ -1,57 +1,68 @@
 import csv
-from Bio.PDB import PDBParser, PDBIO
 import argparse
 
 # Extract the info from the .csv
 def extract_interactions_from_csv(csv_file):
-    interactions = {}
     with open(csv_file, 'r', newline='') as file: 
-        reader = csv.DictReader(file, delimiter=',')
-        for row in reader:
-            residue_number = int(row['R2'])
-            interaction = float(row['TOTAL_AV'])
-            interactions[residue_number] = interaction
+        reader = csv.reader(file, delimiter=',')
+        # Resolve the column positions once from the header, instead of building a dict per row
+        header = next(reader)
+        i_r2, i_total = header.index('R2'), header.index('TOTAL_AV')
+        # Store the values multiplied by -1 to invert them, so that higher interactions have higher B-factors
+        interactions = {int(row[i_r2]): -float(row[i_total]) for row in reader if row} # Skip blank lines, as DictReader does
         return interactions
 
-def gap_protein_residues(interactions, protein_gap):
-    gap = int(protein_gap)
-    return {res_num + gap: val for res_num, val in interactions.items()}
-
-def map_interactions_to_pdb(input_pdb, output_pdb, interactions_dict):
-    parser = PDBParser(QUIET=True)
-    structure = parser.get_structure('protein', input_pdb)
-    
+def map_interactions_to_pdb(input_pdb, output_pdb, interactions_dict, gap=0):
+    # PDB is a fixed-width format: rewrite the B-factor columns (61-66) of the ATOM/HETATM records
+    # line by line, instead of building the whole structure in memory. Other records are copied as they are
     found_count = 0
- 
-    for model in structure:
-        for chain in model:
-            for residue in chain:
-                res_num = residue.id[1]
-                
-                if res_num in interactions_dict:
-                    value = interactions_dict[res_num] * -1 # Multiply by -1 to invert the values, so that higher interactions have higher B-factors
+    missing_residues = []
+    previous_residue = None
+
+    with open(input_pdb, 'r') as fin, open(output_pdb, 'w') as fout:
+        for line in fin:
+            if line.startswith('MODEL'):
+                previous_residue = None
+            if not line.startswith(('ATOM  ', 'HETATM')):
+                fout.write(line)
+                continue
+
+            res_num = int(line[22:26])
+            key = res_num - gap # Apply the protein gap at lookup time (CSV resid = PDB resid - gap)
+            # Chain, residue number and insertion code identify the residue the atom belongs to
+            residue = line[21:27]
+            new_residue = residue != previous_residue
+            previous_residue = residue
+
+            if key in interactions_dict:
+                value = interactions_dict[key] # Already inverted when read from the CSV
+                if new_residue:
                     found_count += 1
-                    for atom in residue:
-                        atom.set_bfactor(value)
-                else:
-                    for atom in residue:
-                        print(f"Residue {res_num} not found in interactions, setting B-factor to 0.0")
-                        atom.set_bfactor(0.0)
-
-    io = PDBIO()
-    io.set_structure(structure)
-    io.save(output_pdb)
+            else:
+                # Reported once, after the loop, instead of once per atom
+                if new_residue:
+                    missing_residues.append(res_num)
+                value = 0.0
+
+            record = line.rstrip('\r\n')
+            fout.write(f"{record[:60].ljust(60)}{value:6.2f}{record[66:]}\n")
+
+    if missing_residues:
+        # Only the first residues are listed (solvated structures may have thousands of waters/ions)
+        shown = ", ".join(str(res_num) for res_num in missing_residues[:20])
+        if len(missing_residues) > 20:
+            shown += ", ..."
+        print(f"{len(missing_residues)} residues not found in interactions, B-factor set to 0.0: {shown}")
     print(f"Found {found_count} residues with interactions.")
     
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Map CSV interactions to PDB structure")
     parser.add_argument("input_csv", help="Path to input CSV file")
-    parser.add_argument("protein_gap", help="Protein gap (it may not begin in resid 1, it may begin in resid 10, etc.)")
+    parser.add_argument("protein_gap", type=int, help="Protein gap (it may not begin in resid 1, it may begin in resid 10, etc.)")
     parser.add_argument("input_pdb", help="Path to input PDB file")
     parser.add_argument("output_pdb", help="Path to output PDB file")
     args = parser.parse_args()
 
     interactions = extract_interactions_from_csv(args.input_csv)
-    interactions_gapped = gap_protein_residues(interactions, args.protein_gap)
-    map_interactions_to_pdb(args.input_pdb, args.output_pdb, interactions_gapped)
+    map_interactions_to_pdb(args.input_pdb, args.output_pdb, interactions, args.protein_gap)
     print(f"Processed: {args.input_csv} -> {args.output_pdb}")
\ No newline at end of file